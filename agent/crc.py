@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Shared CRC implementations
+===========================
+Single home for the checksum code used by the agent's serial protocols,
+so there is one lookup table and one implementation to maintain.
+
+Currently exposes the table-driven CRC-8 (polynomial 0x07, init 0x00) used
+by the TeraRanger Evo Swipe Plus frames. The Marshall-era diag scripts kept
+their own CRC-16/CCITT copies; if CRC-16 framing ever comes back it belongs
+here too.
+"""
+
+
+def _build_crc8_table(poly=0x07):
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return tuple(table)
+
+
+_CRC8_TABLE = _build_crc8_table()
+
+
+def crc8(data, crc=0):
+    """CRC-8 of ``data``. Pass a previous return value as ``crc`` to resume
+    from a partial state (used to skip constant command headers)."""
+    table = _CRC8_TABLE
+    for b in data:
+        crc = table[crc ^ b]
+    return crc
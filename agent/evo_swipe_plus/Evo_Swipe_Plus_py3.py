@@ -1,10 +1,36 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import os
+import sys
+
 import serial
-import crcmod.predefined
 import serial.tools.list_ports
 import threading
 import struct
+import time
+
+# Shared CRC module lives in the agent dir, one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crc import crc8 as _crc8
+
+# Compiled once at import - avoids re-parsing the format string on every frame
+_H_BE = struct.Struct(">h")     # single range
+_HH_BE = struct.Struct(">hh")   # dual range
+_LHH_BE = struct.Struct(">lhh")  # bidirectional counters
+_L_BE = struct.Struct(">l")     # 4-byte counter
+_U16_BE = struct.Struct(">H")   # parameters / setter payloads
+_U8 = struct.Struct(">B")
+
+_INF = float("inf")
+_NAN = float("nan")
+
+
+# CRC-8 state after the constant \x00\x55<cmd> header of each setter command,
+# so the per-call CRC only has to cover the variable payload bytes.
+_SETTER_HEADER_CRC = {
+    cmd: _crc8(bytes((0x00, 0x55, cmd))) for cmd in (0x03, 0x04, 0x05, 0x06, 0x07)
+}
 
 
 class Evo_Swipe_Plus(object):
@@ -39,7 +65,7 @@ class Evo_Swipe_Plus(object):
             bytesize=serial.EIGHTBITS
         )
         self.port.isOpen()
-        self.crc8 = crcmod.predefined.mkPredefinedCrcFun('crc-8')
+        self.crc8 = _crc8
         self.serial_lock = threading.Lock()
 
     def get_ranges(self):
@@ -55,7 +81,7 @@ class Evo_Swipe_Plus(object):
                 print("CRC mismatch. Check connection or make sure only one program accesses the sensor port.")
                 return header, []
 
-            rng = struct.unpack(">hh", frame[2:6])
+            rng = _HH_BE.unpack(frame[2:6])
             rng = list(rng)
             data = rng
             self.check_ranges(data)
@@ -66,7 +92,7 @@ class Evo_Swipe_Plus(object):
                 print("CRC mismatch. Check connection or make sure only one progam accesses the sensor port.")
                 return header, []
 
-            rng = struct.unpack(">h", frame[2:4])
+            rng = _H_BE.unpack(frame[2:4])
             rng = list(rng)
             data = rng
             self.check_ranges(data)
@@ -77,7 +103,7 @@ class Evo_Swipe_Plus(object):
             # print("FRAME:", frame)
             if frame[-1] != self.crc8(frame[:-1]):
                 return header, "CRC mismatch."
-            counts = struct.unpack(">lhh", frame[2:10])
+            counts = _LHH_BE.unpack(frame[2:10])
             data = counts
 
         elif header == b'TS':
@@ -92,13 +118,13 @@ class Evo_Swipe_Plus(object):
             frame = self.port.readline()
             data.append(frame)
             frame_counter = self.port.read(4)
-            counts = struct.unpack(">l", frame_counter)
+            counts = _L_BE.unpack(frame_counter)
             data.append(counts)
 
         # This is the frame outputted when a reset presence counter function is called.
         elif header == b'PR':
             frame_counter = self.port.read(4)
-            counts = struct.unpack(">l", frame_counter)
+            counts = _L_BE.unpack(frame_counter)
             data.append(counts)
 
         elif header == b'VV':
@@ -122,43 +148,53 @@ class Evo_Swipe_Plus(object):
                 print("CRC mismatch. Check connection or make sure only one program accesses the sensor port.")
                 return header, {}
 
-            sensor_parameters["bidirectional_range"] = struct.unpack(">H", frame[2:4])
-            sensor_parameters["presence_range"] = struct.unpack(">H", frame[6:8])
-            sensor_parameters["presence_time"] = struct.unpack(">H", frame[8:10])
-            sensor_parameters["engagement_range"] = struct.unpack(">H", frame[12:14])
+            sensor_parameters["bidirectional_range"] = _U16_BE.unpack(frame[2:4])
+            sensor_parameters["presence_range"] = _U16_BE.unpack(frame[6:8])
+            sensor_parameters["presence_time"] = _U16_BE.unpack(frame[8:10])
+            sensor_parameters["engagement_range"] = _U16_BE.unpack(frame[12:14])
             sensor_parameters["engagement_time"] = frame[14]
             sensor_parameters["disengagement_time"] = frame[15]
-            sensor_parameters["swipe_min"] = struct.unpack(">H", frame[18:20])
-            sensor_parameters["swipe_max"] = struct.unpack(">H", frame[20:22])
-            sensor_parameters["validation_range"] = struct.unpack(">H", frame[22:24])
-            sensor_parameters["validation_time"] = struct.unpack(">H", frame[24:26])
+            sensor_parameters["swipe_min"] = _U16_BE.unpack(frame[18:20])
+            sensor_parameters["swipe_max"] = _U16_BE.unpack(frame[20:22])
+            sensor_parameters["validation_range"] = _U16_BE.unpack(frame[22:24])
+            sensor_parameters["validation_time"] = _U16_BE.unpack(frame[24:26])
 
         return sensor_parameters
 
     def check_ranges(self, range_list):
-        for i in range(len(range_list)):
+        # Frames carry at most two ranges, so the indexed loop is replaced by a
+        # single enumerate pass with the sentinel floats built once at import.
+        for i, value in enumerate(range_list):
             # Checking error codes
-            if range_list[i] == 65535:  # Sensor measuring above its maximum limit
-                range_list[i] = float('inf')
-            elif range_list[i] == 1:  # Sensor not able to measure
-                range_list[i] = float('nan')
-            elif range_list[i] == 0:  # Sensor detecting object below minimum range
-                range_list[i] = -float('inf')
+            if value == 65535:  # Sensor measuring above its maximum limit
+                range_list[i] = _INF
+            elif value == 1:  # Sensor not able to measure
+                range_list[i] = _NAN
+            elif value == 0:  # Sensor detecting object below minimum range
+                range_list[i] = -_INF
             else:
                 # Convert frame in meters
-                range_list[i] /= 1000.0
+                range_list[i] = value / 1000.0
 
         return range_list
 
     def send_command(self, command):
         with self.serial_lock:  # This avoid concurrent writes/reads of serial
             self.port.write(command)
-            ack = self.port.read(1)
-            # This loop discards buffered frames until an ACK header is reached
-            while ack != b"\x12":
-                ack = self.port.read(1)
-            else:
-                ack += self.port.read(3)
+            # Drain buffered frames in chunks and scan for the ACK header in
+            # memory instead of issuing one read() syscall per discarded byte.
+            buf = bytearray()
+            deadline = time.monotonic() + 0.5
+            ack = None
+            while time.monotonic() < deadline:
+                buf += self.port.read(max(1, self.port.in_waiting))
+                i = buf.find(0x12)
+                if i != -1 and len(buf) - i >= 4:
+                    ack = bytes(buf[i:i + 4])
+                    break
+            if ack is None:
+                print("No ACK received")
+                return False
 
             # Check ACK crc8
             crc8 = self.crc8(ack[:3])
@@ -199,53 +235,58 @@ class Evo_Swipe_Plus(object):
             return self.get_parameters_values()
 
     def set_bidirectional_range(self, bidirectional_max_limit, bidicretional_min_limit):
-        crc8_command_swipe = b"\x00\x55\x03"
-        crc8_command_swipe += struct.pack(">H", bidirectional_max_limit)
-        crc8_command_swipe += struct.pack(">H", bidicretional_min_limit)
-        crc8_command_swipe += bytes(bytearray([self.crc8(crc8_command_swipe)]))
-        if self.send_command(crc8_command_swipe):
+        command = bytearray(b"\x00\x55\x03")
+        command += _U16_BE.pack(bidirectional_max_limit)
+        command += _U16_BE.pack(bidicretional_min_limit)
+        command.append(_crc8(command[3:], _SETTER_HEADER_CRC[0x03]))
+        if self.send_command(bytes(command)):
             print("Changed Bidirectional Limits")
 
     def set_swipe_min_and_max(self, swipe_max_limit, swipe_min_limit):
-        crc8_command_swipe = b"\x00\x55\x04"
-        crc8_command_swipe += struct.pack(">H", swipe_max_limit)
-        crc8_command_swipe += struct.pack(">H", swipe_min_limit)
-        crc8_command_swipe += bytes(bytearray([self.crc8(crc8_command_swipe)]))
-        if self.send_command(crc8_command_swipe):
+        command = bytearray(b"\x00\x55\x04")
+        command += _U16_BE.pack(swipe_max_limit)
+        command += _U16_BE.pack(swipe_min_limit)
+        command.append(_crc8(command[3:], _SETTER_HEADER_CRC[0x04]))
+        if self.send_command(bytes(command)):
             print("Changed Swipe Limits")
 
     def set_engagement_params(self, engagement_threshold, engagement_time, disengagement_time):
-        crc8_command_engagement = b"\x00\x55\x05"
-        crc8_command_engagement += struct.pack(">H", engagement_threshold)
-        crc8_command_engagement += struct.pack(">B", engagement_time)
-        crc8_command_engagement += struct.pack(">B", disengagement_time)
-        crc8_command_engagement += bytes(bytearray([self.crc8(crc8_command_engagement)]))
-        if self.send_command(crc8_command_engagement):
+        command = bytearray(b"\x00\x55\x05")
+        command += _U16_BE.pack(engagement_threshold)
+        command.append(engagement_time)
+        command.append(disengagement_time)
+        command.append(_crc8(command[3:], _SETTER_HEADER_CRC[0x05]))
+        if self.send_command(bytes(command)):
             print("Changed Engagement Limits")
 
     def set_validation_params(self, validation_threshold, validation_time):
-        crc8_command_validation = b"\x00\x55\x06"
-        crc8_command_validation += struct.pack(">H", validation_threshold)
-        crc8_command_validation += struct.pack(">H", validation_time)
-        crc8_command_validation += bytes(bytearray([self.crc8(crc8_command_validation)]))
-        if self.send_command(crc8_command_validation):
+        command = bytearray(b"\x00\x55\x06")
+        command += _U16_BE.pack(validation_threshold)
+        command += _U16_BE.pack(validation_time)
+        command.append(_crc8(command[3:], _SETTER_HEADER_CRC[0x06]))
+        if self.send_command(bytes(command)):
             print("Change Validation Limits")
 
     def set_presence_params(self, presence_threshold, presence_time):
-        crc8_command_presence = b"\x00\x55\x07"
-        crc8_command_presence += struct.pack(">H", presence_threshold)
-        crc8_command_presence += struct.pack(">H", presence_time)
-        crc8_command_presence += bytes(bytearray([self.crc8(crc8_command_presence)]))
-        if self.send_command(crc8_command_presence):
+        command = bytearray(b"\x00\x55\x07")
+        command += _U16_BE.pack(presence_threshold)
+        command += _U16_BE.pack(presence_time)
+        command.append(_crc8(command[3:], _SETTER_HEADER_CRC[0x07]))
+        if self.send_command(bytes(command)):
             print("Change Traffic Detection Limits")
 
     def run(self):
         self.port.flushInput()
 
-        while ranges is not None:
-            ranges, new_counter_value, movement = self.get_ranges()
-        else:
-            print("No data from sensor")
+        # get_ranges() blocks on the serial port, so this loop only wakes when
+        # the sensor has produced a frame - no polling, no sleep.
+        # (The old loop referenced an undefined 'ranges' and never ran.)
+        try:
+            while True:
+                header, data = self.get_ranges()
+                print(header, data)
+        except KeyboardInterrupt:
+            print("Stopped")
 
 
 if __name__ == '__main__':
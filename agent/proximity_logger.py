@@ -11,23 +11,97 @@ from __future__ import annotations
 
 import json
 import os
+import queue
 import sqlite3
 import threading
 import time
+from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
+# orjson is optional, same as in the payment agent — the data column stays
+# TEXT so rows written either way read back identically
+try:
+    import orjson
+
+    def _dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    _dumps = json.dumps
+
 DB_PATH = os.getenv("EVO_DB_PATH", "/home/shaka/proximity_events.db")
 
 _local = threading.local()
 
+# Events are queued here and drained by a single background writer thread,
+# which commits one transaction per batch instead of one per event. During
+# gesture bursts that turns O(events) fsyncs into O(batches).
+_event_queue: queue.Queue = queue.Queue()
+_writer_started = False
+_writer_lock = threading.Lock()
+
+# Heartbeat-summary memoization: generation bumps on every committed batch
+# so a write instantly invalidates the cached value; the TTL bounds staleness
+# for readers on other processes' connections
+_write_gen = 0
+_summary_cache: Dict[str, Any] = {"key": None, "value": None, "expires": 0.0}
+_summary_lock = threading.Lock()
+_SUMMARY_TTL = 2.0
+
+# Max events folded into a single transaction
+_BATCH_SIZE = 100
+
+# Hot-path SQL as module constants: sqlite3's statement cache is keyed on
+# the exact string, so a single shared literal guarantees the compiled
+# statement is reused across every event
+_SQL_INSERT_EVENT = (
+    "INSERT INTO proximity_events (timestamp, date, hour, event_type, data, distance_mm) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+_SQL_UPSERT_HOURLY = """
+    INSERT INTO proximity_daily_stats
+        (date, hour, presence_count, engagement_count, gesture_left, gesture_right, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(date, hour) DO UPDATE SET
+        presence_count = presence_count + excluded.presence_count,
+        engagement_count = engagement_count + excluded.engagement_count,
+        gesture_left = gesture_left + excluded.gesture_left,
+        gesture_right = gesture_right + excluded.gesture_right,
+        updated_at = excluded.updated_at
+"""
+
+_SQL_UPDATE_DISTANCE = """
+    UPDATE proximity_daily_stats
+    SET sum_distance_mm = sum_distance_mm + ?,
+        count_distance_mm = count_distance_mm + 1,
+        avg_distance_mm = (sum_distance_mm + ?) * 1.0 / (count_distance_mm + 1),
+        min_distance_mm = CASE
+            WHEN min_distance_mm = 0 OR ? < min_distance_mm THEN ?
+            ELSE min_distance_mm
+        END
+    WHERE date = ? AND hour = ?
+"""
+
 
 def _get_conn() -> sqlite3.Connection:
     """Get a thread-local SQLite connection."""
     if not hasattr(_local, "conn") or _local.conn is None:
-        _local.conn = sqlite3.connect(DB_PATH, timeout=5)
+        # isolation_level=None: autocommit, with the writer thread managing
+        # its batch transactions explicitly via BEGIN IMMEDIATE
+        _local.conn = sqlite3.connect(
+            DB_PATH, timeout=5, cached_statements=256, isolation_level=None
+        )
         _local.conn.row_factory = sqlite3.Row
         _local.conn.execute("PRAGMA journal_mode=WAL")
         _local.conn.execute("PRAGMA synchronous=NORMAL")
+        # Wait out writer/reader collisions instead of raising SQLITE_BUSY
+        _local.conn.execute("PRAGMA busy_timeout=5000")
+        # Keep temp b-trees and a decent page cache in RAM rather than on
+        # the SD card; mmap lets reads skip the read() syscall path
+        _local.conn.execute("PRAGMA temp_store=MEMORY")
+        _local.conn.execute("PRAGMA cache_size=-16384")
+        _local.conn.execute("PRAGMA mmap_size=268435456")
+        _local.conn.execute("PRAGMA wal_autocheckpoint=1000")
     return _local.conn
 
 
@@ -45,10 +119,16 @@ def init_db():
             distance_mm INTEGER DEFAULT 0
         );
 
-        CREATE INDEX IF NOT EXISTS idx_events_date ON proximity_events(date);
         CREATE INDEX IF NOT EXISTS idx_events_type ON proximity_events(event_type);
         CREATE INDEX IF NOT EXISTS idx_events_timestamp ON proximity_events(timestamp);
 
+        -- Covering partial index for per-hour distance analytics; rows with
+        -- distance_mm=0 (the majority) are excluded to keep it small. Its
+        -- date prefix supersedes the old idx_events_date for our queries.
+        CREATE INDEX IF NOT EXISTS idx_events_date_hour_dist
+            ON proximity_events(date, hour, distance_mm) WHERE distance_mm > 0;
+        DROP INDEX IF EXISTS idx_events_date;
+
         CREATE TABLE IF NOT EXISTS proximity_daily_stats (
             date TEXT NOT NULL,
             hour INTEGER NOT NULL,
@@ -59,90 +139,113 @@ def init_db():
             avg_distance_mm REAL DEFAULT 0,
             min_distance_mm INTEGER DEFAULT 0,
             max_visit_duration_s REAL DEFAULT 0,
+            sum_distance_mm INTEGER DEFAULT 0,
+            count_distance_mm INTEGER DEFAULT 0,
             updated_at REAL NOT NULL,
             PRIMARY KEY (date, hour)
         );
     """)
+    # Running-sum columns added after initial deployment; bring old DBs up
+    # to date (SQLite has no ADD COLUMN IF NOT EXISTS)
+    for col in ("sum_distance_mm", "count_distance_mm"):
+        try:
+            conn.execute(f"ALTER TABLE proximity_daily_stats ADD COLUMN {col} INTEGER DEFAULT 0")
+        except sqlite3.OperationalError:
+            pass  # column already exists
     conn.commit()
+    _ensure_writer()
 
 
 def log_event(event_type: str, data: Any = None, distance_mm: int = 0):
-    """Log a proximity event to the database."""
+    """Queue a proximity event for the background writer (non-blocking)."""
     try:
-        conn = _get_conn()
         now = time.time()
-        from datetime import datetime
         dt = datetime.fromtimestamp(now)
-        date_str = dt.strftime("%Y-%m-%d")
-        hour = dt.hour
-
-        conn.execute(
-            "INSERT INTO proximity_events (timestamp, date, hour, event_type, data, distance_mm) VALUES (?, ?, ?, ?, ?, ?)",
-            (now, date_str, hour, event_type, json.dumps(data) if data else None, distance_mm)
-        )
-        conn.commit()
-
-        # Update hourly stats
-        _update_hourly_stats(conn, date_str, hour, event_type, distance_mm)
+        _event_queue.put((
+            now, dt.strftime("%Y-%m-%d"), dt.hour, event_type,
+            _dumps(data) if data else None, distance_mm,
+        ))
+        _ensure_writer()
     except Exception as e:
         import logging
         logging.getLogger("proximity_logger").error(f"Failed to log event: {e}")
 
 
+def flush(timeout: Optional[float] = None):
+    """Block until all queued events are committed (shutdown helper)."""
+    if timeout is None:
+        _event_queue.join()
+        return
+    deadline = time.monotonic() + timeout
+    while _event_queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+
+def _ensure_writer():
+    global _writer_started
+    if _writer_started:
+        return
+    with _writer_lock:
+        if not _writer_started:
+            threading.Thread(
+                target=_writer_loop, name="proximity-writer", daemon=True
+            ).start()
+            _writer_started = True
+
+
+def _writer_loop():
+    """Drain the event queue, one transaction per batch."""
+    conn = _get_conn()
+    while True:
+        batch = [_event_queue.get()]
+        try:
+            while len(batch) < _BATCH_SIZE:
+                batch.append(_event_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(_SQL_INSERT_EVENT, batch)
+            for _ts, date_str, hour, event_type, _data, distance_mm in batch:
+                _update_hourly_stats(conn, date_str, hour, event_type, distance_mm)
+            conn.commit()
+            global _write_gen
+            _write_gen += 1
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            import logging
+            logging.getLogger("proximity_logger").error(f"Failed to write event batch: {e}")
+        finally:
+            for _ in batch:
+                _event_queue.task_done()
+
+
 def _update_hourly_stats(conn: sqlite3.Connection, date: str, hour: int, event_type: str, distance_mm: int):
-    """Update the hourly aggregated stats."""
+    """Update the hourly aggregated stats (runs inside the writer's batch transaction)."""
     now = time.time()
 
-    # Upsert the row
-    conn.execute("""
-        INSERT INTO proximity_daily_stats (date, hour, updated_at)
-        VALUES (?, ?, ?)
-        ON CONFLICT(date, hour) DO UPDATE SET updated_at = ?
-    """, (date, hour, now, now))
-
-    if event_type == "presence":
-        conn.execute("""
-            UPDATE proximity_daily_stats
-            SET presence_count = presence_count + 1
-            WHERE date = ? AND hour = ?
-        """, (date, hour))
-    elif event_type == "engagement":
-        conn.execute("""
-            UPDATE proximity_daily_stats
-            SET engagement_count = engagement_count + 1
-            WHERE date = ? AND hour = ?
-        """, (date, hour))
-    elif event_type == "gesture":
-        pass  # handled below
-
-    if event_type == "gesture_left":
-        conn.execute("""
-            UPDATE proximity_daily_stats
-            SET gesture_left = gesture_left + 1
-            WHERE date = ? AND hour = ?
-        """, (date, hour))
-    elif event_type == "gesture_right":
-        conn.execute("""
-            UPDATE proximity_daily_stats
-            SET gesture_right = gesture_right + 1
-            WHERE date = ? AND hour = ?
-        """, (date, hour))
+    # Single upsert: the event type picks which counter delta is non-zero,
+    # so one statement replaces the old upsert + per-type UPDATE round trips
+    conn.execute(_SQL_UPSERT_HOURLY, (
+        date, hour,
+        1 if event_type == "presence" else 0,
+        1 if event_type == "engagement" else 0,
+        1 if event_type == "gesture_left" else 0,
+        1 if event_type == "gesture_right" else 0,
+        now,
+    ))
 
     if distance_mm > 0:
-        conn.execute("""
-            UPDATE proximity_daily_stats
-            SET avg_distance_mm = (
-                SELECT AVG(distance_mm) FROM proximity_events
-                WHERE date = ? AND hour = ? AND distance_mm > 0
-            ),
-            min_distance_mm = (
-                SELECT MIN(distance_mm) FROM proximity_events
-                WHERE date = ? AND hour = ? AND distance_mm > 0
-            )
-            WHERE date = ? AND hour = ?
-        """, (date, hour, date, hour, date, hour))
-
-    conn.commit()
+        # Incremental aggregates: O(1) per event instead of re-scanning the
+        # hour's events with AVG/MIN subqueries on every insert. The right-
+        # hand sides all read the pre-update values, so avg comes out as
+        # (old_sum + d) / (old_count + 1).
+        conn.execute(_SQL_UPDATE_DISTANCE,
+                     (distance_mm, distance_mm, distance_mm, distance_mm, date, hour))
 
 
 # ---------------------------------------------------------------------------
@@ -151,7 +254,6 @@ def _update_hourly_stats(conn: sqlite3.Connection, date: str, hour: int, event_t
 
 def get_today_stats() -> Dict[str, Any]:
     """Get today's aggregated stats."""
-    from datetime import datetime
     today = datetime.now().strftime("%Y-%m-%d")
     return get_daily_stats(today)
 
@@ -197,7 +299,6 @@ def get_daily_stats(date: str) -> Dict[str, Any]:
 
 def get_weekly_stats() -> Dict[str, Any]:
     """Get stats for the last 7 days."""
-    from datetime import datetime, timedelta
     try:
         conn = _get_conn()
         end_date = datetime.now()
@@ -247,12 +348,19 @@ def get_weekly_stats() -> Dict[str, Any]:
         return {"ok": False, "error": str(e)}
 
 
-def get_recent_events(limit: int = 50) -> Dict[str, Any]:
-    """Get the most recent events."""
+def get_recent_events(limit: int = 50, include_data: bool = False) -> Dict[str, Any]:
+    """Get the most recent events.
+
+    The data column (free-form JSON, the widest field) is only fetched when
+    ``include_data`` is set — most consumers just want the event stream.
+    """
     try:
         conn = _get_conn()
+        cols = "id, timestamp, date, hour, event_type, distance_mm"
+        if include_data:
+            cols += ", data"
         rows = conn.execute(
-            "SELECT * FROM proximity_events ORDER BY timestamp DESC LIMIT ?",
+            f"SELECT {cols} FROM proximity_events ORDER BY timestamp DESC LIMIT ?",
             (limit,)
         ).fetchall()
 
@@ -264,8 +372,13 @@ def get_recent_events(limit: int = 50) -> Dict[str, Any]:
 
 def get_summary_for_heartbeat() -> Dict[str, Any]:
     """Get a compact summary suitable for sending in heartbeat to fleet manager."""
-    from datetime import datetime
     today = datetime.now().strftime("%Y-%m-%d")
+
+    cache_key = (today, _write_gen)
+    with _summary_lock:
+        if _summary_cache["key"] == cache_key and time.time() < _summary_cache["expires"]:
+            return _summary_cache["value"]
+
     try:
         conn = _get_conn()
         row = conn.execute("""
@@ -280,19 +393,26 @@ def get_summary_for_heartbeat() -> Dict[str, Any]:
         if row and row["presence_today"] is not None:
             presence = row["presence_today"]
             engagement = row["engagement_today"]
-            return {
+            result = {
                 "presence_today": presence,
                 "engagement_today": engagement,
                 "gestures_today": row["gestures_today"] or 0,
                 "conversion_rate": round(engagement / presence * 100, 1) if presence > 0 else 0.0,
                 "date": today,
             }
-        return {
-            "presence_today": 0,
-            "engagement_today": 0,
-            "gestures_today": 0,
-            "conversion_rate": 0.0,
-            "date": today,
-        }
+        else:
+            result = {
+                "presence_today": 0,
+                "engagement_today": 0,
+                "gestures_today": 0,
+                "conversion_rate": 0.0,
+                "date": today,
+            }
+
+        with _summary_lock:
+            _summary_cache["key"] = cache_key
+            _summary_cache["value"] = result
+            _summary_cache["expires"] = time.time() + _SUMMARY_TTL
+        return result
     except Exception as e:
         return {"error": str(e)}
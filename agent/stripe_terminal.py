@@ -34,12 +34,22 @@ import logging
 import os
 import threading
 import time
-import uuid
-from dataclasses import asdict, dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import http.client
 from typing import Any, Callable, Dict, List, Optional
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlsplit
+
+# orjson (C-implemented) is optional — nice to have for the state-file hot
+# path, but the agent must run on a bare Pi image with stdlib only.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Response parsing takes bytes directly either way (stdlib json accepts
+# bytes since 3.6), so the API helpers skip the intermediate decode
+_json_loads = orjson.loads if orjson is not None else json.loads
 
 logger = logging.getLogger("stripe_terminal")
 
@@ -48,6 +58,8 @@ logger = logging.getLogger("stripe_terminal")
 # ---------------------------------------------------------------------------
 # Stripe API
 STRIPE_API_URL = "https://api.stripe.com/v1"
+_STRIPE_HOST = urlsplit(STRIPE_API_URL).netloc
+_STRIPE_BASE_PATH = urlsplit(STRIPE_API_URL).path
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY", "")
 
 # Reader ID assigned by Stripe (e.g. tmr_xxx)
@@ -61,9 +73,18 @@ SIMULATION = os.getenv("STRIPE_SIMULATION", "1") == "1"
 
 # Decimal places for price (Canada=2)
 DECIMAL_PLACES = int(os.getenv("STRIPE_DECIMAL_PLACES", "2"))
+_PRICE_SCALE = 10 ** DECIMAL_PLACES
+
+
+def _format_price(amount: int) -> str:
+    """Format a smallest-unit amount for display (integer math, no float)."""
+    if not DECIMAL_PLACES:
+        return str(amount)
+    return f"{amount // _PRICE_SCALE}.{amount % _PRICE_SCALE:0{DECIMAL_PLACES}d}"
 
 # State file (shared with vend server)
 STATE_FILE = os.getenv("STRIPE_STATE_FILE", "/tmp/shaka_stripe_state.json")
+_STATE_TMP = STATE_FILE + ".tmp"
 
 # Timeouts
 VEND_RESULT_TIMEOUT = int(os.getenv("STRIPE_VEND_RESULT_TIMEOUT", "30"))
@@ -99,7 +120,7 @@ class PaymentResult(str, enum.Enum):
     CANCELLED = "cancelled"
 
 
-@dataclass
+@dataclass(slots=True)
 class VendItem:
     """Single product in a vend session."""
     code: int          # product code / slot number
@@ -109,10 +130,18 @@ class VendItem:
     qty: int = 1       # quantity
 
     def to_dict(self) -> Dict[str, Any]:
-        return asdict(self)
+        # asdict() walks the dataclass via reflection and deep-copies; the
+        # schema is tiny and flat, so build the dict directly.
+        return {
+            "code": self.code,
+            "price": self.price,
+            "name": self.name,
+            "unit": self.unit,
+            "qty": self.qty,
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class VendSession:
     """A vending session with one or more items (multi-vend support)."""
     session_id: str = ""
@@ -130,30 +159,46 @@ class VendSession:
     error: Optional[str] = None
     created_at: float = 0.0
     updated_at: float = 0.0
+    # Serialized items list, rebuilt only when the cart changes. to_dict()
+    # runs on every state transition but the cart rarely does.
+    _items_cache: Optional[List[Dict[str, Any]]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def __post_init__(self):
+        # One clock read per construction; the three timestamps and the
+        # session id all derive from the same instant.
+        now = time.time()
         if not self.session_id:
-            self.session_id = f"sess-{int(time.time() * 1000)}"
+            self.session_id = f"sess-{int(now * 1000)}"
         if not self.created_at:
-            self.created_at = time.time()
-        self.updated_at = time.time()
-        self._compute_total()
+            self.created_at = now
+        self.updated_at = now
+        if self.items:
+            self._compute_total()
 
     def _compute_total(self):
         self.total_price = sum(item.price * item.qty for item in self.items)
+        self._items_cache = None
 
     def add_item(self, item: VendItem):
         self.items.append(item)
-        self._compute_total()
+        # Incremental update; callers that remove items still re-run
+        # _compute_total() to resync from scratch
+        self.total_price += item.price * item.qty
+        self._items_cache = None
         self.updated_at = time.time()
 
     def to_dict(self) -> Dict[str, Any]:
+        items = self._items_cache
+        if items is None:
+            items = self._items_cache = [i.to_dict() for i in self.items]
         return {
             "session_id": self.session_id,
             "payment_intent_id": self.payment_intent_id,
-            "items": [i.to_dict() for i in self.items],
+            "items": items,
             "total_price": self.total_price,
-            "total_display": f"{self.total_price / (10 ** DECIMAL_PLACES):.{DECIMAL_PLACES}f}",
+            "total_display": _format_price(self.total_price),
             "captured_amount": self.captured_amount,
             "state": self.state,
             "payment_result": self.payment_result,
@@ -171,10 +216,46 @@ class VendSession:
 # ---------------------------------------------------------------------------
 # Stripe API helpers (direct calls from agent)
 # ---------------------------------------------------------------------------
-def _stripe_auth_header() -> str:
-    """Build HTTP Basic auth header for Stripe API."""
-    token = base64.b64encode(f"{STRIPE_SECRET_KEY}:".encode()).decode()
-    return f"Basic {token}"
+# The secret key is fixed for the process lifetime, so the Basic auth token
+# and the header dicts are built once instead of per call
+_AUTH_HEADER = "Basic " + base64.b64encode(f"{STRIPE_SECRET_KEY}:".encode()).decode()
+_POST_HEADERS = {
+    "Authorization": _AUTH_HEADER,
+    "Content-Type": "application/x-www-form-urlencoded",
+}
+_GET_HEADERS = {"Authorization": _AUTH_HEADER}
+
+
+# One persistent keep-alive connection per thread. Stripe keeps API sockets
+# open, so reusing the connection skips a TCP+TLS handshake per call — the
+# dominant cost of the poll loop's 2s-interval GETs on a high-latency link.
+_conn_local = threading.local()
+
+
+def _stripe_request(method: str, path: str, body: Optional[bytes],
+                    headers: Dict[str, str]):
+    """
+    Issue one request on this thread's persistent HTTPS connection.
+    Returns (status, response bytes). A stale keep-alive socket surfaces as
+    an exception on the first attempt — drop it, reconnect and retry once.
+    """
+    for attempt in (0, 1):
+        conn = getattr(_conn_local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPSConnection(_STRIPE_HOST, timeout=API_TIMEOUT)
+            _conn_local.conn = conn
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            return resp.status, resp.read()
+        except (http.client.HTTPException, OSError):
+            _conn_local.conn = None
+            try:
+                conn.close()
+            except Exception:
+                pass
+            if attempt:
+                raise
 
 
 def _stripe_post(endpoint: str, params: Dict[str, str]) -> Dict[str, Any]:
@@ -182,64 +263,50 @@ def _stripe_post(endpoint: str, params: Dict[str, str]) -> Dict[str, Any]:
     POST to Stripe API with form-encoded params.
     Stripe uses application/x-www-form-urlencoded, not JSON.
     """
-    url = f"{STRIPE_API_URL}/{endpoint.lstrip('/')}"
+    path = f"{_STRIPE_BASE_PATH}/{endpoint.lstrip('/')}"
     body = urlencode(params).encode("utf-8")
 
-    logger.info(f"[STRIPE] POST {url}")
-    logger.debug(f"[STRIPE] Params: {params}")
+    logger.info("[STRIPE] POST %s", path)
+    logger.debug("[STRIPE] Params: %s", params)
 
     try:
-        req = Request(url, data=body, headers={
-            "Authorization": _stripe_auth_header(),
-            "Content-Type": "application/x-www-form-urlencoded",
-        }, method="POST")
-        with urlopen(req, timeout=API_TIMEOUT) as resp:
-            resp_body = resp.read().decode("utf-8")
-            result = json.loads(resp_body) if resp_body else {}
-            logger.info(f"[STRIPE] Response {resp.status}: {json.dumps(result)[:200]}")
-            return result
-    except HTTPError as e:
-        error_body = ""
-        try:
-            error_body = e.read().decode("utf-8")
-        except Exception:
-            pass
-        logger.error(f"[STRIPE] HTTP {e.code}: {error_body[:500]}")
-        error_msg = ""
+        status, resp_body = _stripe_request("POST", path, body, _POST_HEADERS)
+    except (http.client.HTTPException, OSError) as e:
+        logger.error(f"[STRIPE] Network error: {e}")
+        raise RuntimeError(f"Stripe network error: {e}")
+
+    if status >= 400:
+        error_body = resp_body.decode("utf-8", "replace")
+        logger.error(f"[STRIPE] HTTP {status}: {error_body[:500]}")
         try:
             error_msg = json.loads(error_body).get("error", {}).get("message", error_body[:200])
         except Exception:
             error_msg = error_body[:200]
-        raise RuntimeError(f"Stripe API error {e.code}: {error_msg}")
-    except URLError as e:
-        logger.error(f"[STRIPE] Network error: {e.reason}")
-        raise RuntimeError(f"Stripe network error: {e.reason}")
+        raise RuntimeError(f"Stripe API error {status}: {error_msg}")
+
+    result = _json_loads(resp_body) if resp_body else {}
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("[STRIPE] Response %s: %s", status, json.dumps(result)[:200])
+    return result
 
 
 def _stripe_get(endpoint: str) -> Dict[str, Any]:
     """GET from Stripe API."""
-    url = f"{STRIPE_API_URL}/{endpoint.lstrip('/')}"
-    logger.info(f"[STRIPE] GET {url}")
+    path = f"{_STRIPE_BASE_PATH}/{endpoint.lstrip('/')}"
+    logger.info("[STRIPE] GET %s", path)
 
     try:
-        req = Request(url, headers={
-            "Authorization": _stripe_auth_header(),
-        }, method="GET")
-        with urlopen(req, timeout=API_TIMEOUT) as resp:
-            resp_body = resp.read().decode("utf-8")
-            result = json.loads(resp_body) if resp_body else {}
-            return result
-    except HTTPError as e:
-        error_body = ""
-        try:
-            error_body = e.read().decode("utf-8")
-        except Exception:
-            pass
-        logger.error(f"[STRIPE] GET HTTP {e.code}: {error_body[:500]}")
-        raise RuntimeError(f"Stripe API error {e.code}: {error_body[:200]}")
-    except URLError as e:
-        logger.error(f"[STRIPE] GET Network error: {e.reason}")
-        raise RuntimeError(f"Stripe network error: {e.reason}")
+        status, resp_body = _stripe_request("GET", path, None, _GET_HEADERS)
+    except (http.client.HTTPException, OSError) as e:
+        logger.error(f"[STRIPE] GET Network error: {e}")
+        raise RuntimeError(f"Stripe network error: {e}")
+
+    if status >= 400:
+        error_body = resp_body.decode("utf-8", "replace")
+        logger.error(f"[STRIPE] GET HTTP {status}: {error_body[:500]}")
+        raise RuntimeError(f"Stripe API error {status}: {error_body[:200]}")
+
+    return _json_loads(resp_body) if resp_body else {}
 
 
 # ---------------------------------------------------------------------------
@@ -254,6 +321,26 @@ class StripeTerminal:
     In SIMULATION mode, transactions are auto-approved after a delay.
     """
 
+    __slots__ = (
+        "simulation",
+        "reader_id",
+        "machine_id",
+        "_connected",
+        "_state",
+        "_current_session",
+        "_lock",
+        "_callbacks",
+        "_sim_approval_delay",
+        "_sim_auto_approve",
+        "_cancel_event",
+        "_sim_pool",
+        "_api_calls",
+        "_api_errors",
+        "_persist_version",
+        "_persist_event",
+        "_persist_thread",
+    )
+
     def __init__(self, simulation: bool = SIMULATION):
         self.simulation = simulation
         self.reader_id = STRIPE_READER_ID
@@ -262,22 +349,45 @@ class StripeTerminal:
         self._state = TerminalState.DISCONNECTED
         self._current_session: Optional[VendSession] = None
         self._lock = threading.Lock()
-        self._callbacks: Dict[str, List[Callable]] = {
-            "on_state_change": [],
-            "on_payment_authorized": [],
-            "on_payment_denied": [],
-            "on_payment_captured": [],
-            "on_session_complete": [],
-            "on_error": [],
+        # Callbacks are stored as tuples and swapped wholesale in on(), so
+        # _emit iterates an immutable snapshot — no lock needed even if a
+        # listener registers while the webhook thread is dispatching.
+        self._callbacks: Dict[str, tuple] = {
+            "on_state_change": (),
+            "on_payment_authorized": (),
+            "on_payment_denied": (),
+            "on_payment_captured": (),
+            "on_session_complete": (),
+            "on_error": (),
         }
         # Simulation config
         self._sim_approval_delay = float(os.getenv("STRIPE_SIM_APPROVAL_DELAY", "3.0"))
         self._sim_auto_approve = os.getenv("STRIPE_SIM_AUTO_APPROVE", "1") == "1"
+        # Set by cancel_session to abort a pending simulated authorization
+        self._cancel_event = threading.Event()
+        # One reusable worker instead of a fresh thread per simulated
+        # session; the pool spawns its thread lazily on first submit
+        self._sim_pool = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="stripe-sim")
+            if simulation else None
+        )
 
         # API stats
         self._api_calls = 0
         self._api_errors = 0
 
+        # Version of the last state snapshot written to STATE_FILE, used to
+        # skip redundant serialization when nothing changed
+        self._persist_version: Optional[tuple] = None
+
+        # Background writer thread: _persist_state only signals the event, so
+        # webhook/poll threads never block on state-file I/O
+        self._persist_event = threading.Event()
+        self._persist_thread = threading.Thread(
+            target=self._persist_loop, name="stripe-persist", daemon=True
+        )
+        self._persist_thread.start()
+
     # -- Connection ---------------------------------------------------------
     def connect(self) -> bool:
         """Initialize connection (verify reader is online via Stripe API)."""
@@ -323,6 +433,7 @@ class StripeTerminal:
         """Disconnect / cleanup."""
         self._connected = False
         self._set_state(TerminalState.DISCONNECTED)
+        self.flush_state()
         logger.info("[STRIPE] Disconnected")
 
     @property
@@ -340,11 +451,14 @@ class StripeTerminal:
     # -- Callbacks ----------------------------------------------------------
     def on(self, event: str, callback: Callable):
         """Register a callback for an event."""
-        if event in self._callbacks:
-            self._callbacks[event].append(callback)
+        cbs = self._callbacks.get(event)
+        if cbs is not None:
+            self._callbacks[event] = cbs + (callback,)
 
     def _emit(self, event: str, *args, **kwargs):
-        for cb in self._callbacks.get(event, []):
+        # Every _emit call site uses a literal key from the fixed event set
+        # initialised in __init__, so index directly instead of .get()
+        for cb in self._callbacks[event]:
             try:
                 cb(*args, **kwargs)
             except Exception as e:
@@ -352,34 +466,87 @@ class StripeTerminal:
 
     # -- State management ---------------------------------------------------
     def _set_state(self, new_state: TerminalState):
-        old = self._state
-        self._state = new_state
-        if self._current_session:
-            self._current_session.state = new_state.value
-            self._current_session.updated_at = time.time()
+        # Mutate under the lock; persist signal, logging and callbacks run
+        # outside it so listeners can never stall a webhook/poll thread
+        # that is mid-transition.
+        with self._lock:
+            old = self._state
+            if old is new_state:
+                # Re-asserting the current state (e.g. repeated action_updated
+                # webhooks) — skip the timestamp stamp and the persist signal
+                return
+            new_value = new_state.value
+            self._state = new_state
+            if self._current_session:
+                self._current_session.state = new_value
+                self._current_session.updated_at = time.time()
         self._persist_state()
-        if old != new_state:
-            logger.info(f"[STRIPE] State: {old.value} -> {new_state.value}")
-            self._emit("on_state_change", old, new_state)
+        logger.info("[STRIPE] State: %s -> %s", old.value, new_value)
+        self._emit("on_state_change", old, new_state)
 
     def _persist_state(self):
+        """Request a state-file write from the background writer (non-blocking)."""
+        self._persist_event.set()
+
+    def _persist_loop(self):
+        """Daemon loop that writes the state file whenever signalled."""
+        while True:
+            self._persist_event.wait()
+            # Debounce: a vend flow fires several transitions back-to-back
+            # (waiting_payment -> authorizing -> ...); sleeping briefly before
+            # clearing collapses the burst into a single write of the final
+            # state, which is all external readers care about.
+            time.sleep(0.02)
+            self._persist_event.clear()
+            self._write_state()
+
+    def flush_state(self):
+        """Synchronously write the state file (for shutdown paths)."""
+        self._persist_event.clear()
+        self._write_state()
+
+    def _write_state(self):
         """Write current state to JSON file for other processes to read."""
         try:
-            data = {
-                "connected": self._connected,
-                "simulation": self.simulation,
-                "protocol": "stripe_terminal",
-                "reader_id": self.reader_id,
-                "state": self._state.value,
-                "session": self._current_session.to_dict() if self._current_session else None,
-                "timestamp": time.time(),
-                "api_stats": {
-                    "calls": self._api_calls,
-                    "errors": self._api_errors,
-                },
-            }
-            with open(STATE_FILE, "w") as f:
-                json.dump(data, f, indent=2)
+            # Snapshot under the lock, serialize and write outside it
+            with self._lock:
+                session = self._current_session
+                state_value = self._state.value
+                version = (
+                    self._connected,
+                    state_value,
+                    session.updated_at if session else 0.0,
+                    self._api_calls,
+                    self._api_errors,
+                )
+                if version == self._persist_version:
+                    return  # nothing changed since the last write
+                data = {
+                    "connected": self._connected,
+                    "simulation": self.simulation,
+                    "protocol": "stripe_terminal",
+                    "reader_id": self.reader_id,
+                    "state": state_value,
+                    "session": session.to_dict() if session else None,
+                    "timestamp": time.time(),
+                    "api_stats": {
+                        "calls": self._api_calls,
+                        "errors": self._api_errors,
+                    },
+                }
+            # Write to a sibling temp file and rename over STATE_FILE so
+            # readers (vend server status endpoint) never see a torn file.
+            if orjson is not None:
+                buf = orjson.dumps(data)
+            else:
+                buf = json.dumps(data, separators=(",", ":")).encode("utf-8")
+            fd = os.open(_STATE_TMP, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.write(fd, buf)
+            finally:
+                os.close(fd)
+            os.replace(_STATE_TMP, STATE_FILE)
+            self._persist_version = version
         except Exception as e:
             logger.error(f"[STRIPE] Failed to persist state: {e}")
 
@@ -409,11 +576,11 @@ class StripeTerminal:
         self._current_session = session
         self._set_state(TerminalState.CREATING_INTENT)
 
-        logger.info(f"[STRIPE] Payment request: {len(items)} items, total={session.total_price}¢")
+        logger.info("[STRIPE] Payment request: %d items, total=%d¢", len(items), session.total_price)
 
         if self.simulation:
-            t = threading.Thread(target=self._sim_authorize, args=(session,), daemon=True)
-            t.start()
+            self._cancel_event.clear()
+            self._sim_pool.submit(self._sim_authorize, session)
         else:
             self._create_and_process_payment(session)
 
@@ -435,8 +602,8 @@ class StripeTerminal:
         session.add_item(item)
         new_total = session.total_price
 
-        logger.info(f"[STRIPE] Adding item: code={item.code} price={item.price}¢ "
-                     f"new_total={new_total}¢")
+        logger.info("[STRIPE] Adding item: code=%s price=%d¢ new_total=%d¢",
+                    item.code, item.price, new_total)
 
         if not self.simulation and session.incremental_supported:
             # Increment authorization via Fleet Manager
@@ -508,6 +675,7 @@ class StripeTerminal:
 
     def cancel_session(self):
         """Cancel the current session."""
+        self._cancel_event.set()
         session = self._current_session
         if session:
             if not self.simulation and session.payment_intent_id:
@@ -529,20 +697,29 @@ class StripeTerminal:
 
     def get_state_snapshot(self) -> Dict[str, Any]:
         """Get current state as dict (for API responses)."""
-        return {
-            "connected": self._connected,
-            "simulation": self.simulation,
-            "protocol": "stripe_terminal",
-            "reader_id": self.reader_id,
-            "state": self._state.value,
-            "session": self._current_session.to_dict() if self._current_session else None,
-            "api_stats": {
-                "calls": self._api_calls,
-                "errors": self._api_errors,
-            },
-        }
+        with self._lock:
+            return {
+                "connected": self._connected,
+                "simulation": self.simulation,
+                "protocol": "stripe_terminal",
+                "reader_id": self.reader_id,
+                "state": self._state.value,
+                "session": self._current_session.to_dict() if self._current_session else None,
+                "api_stats": {
+                    "calls": self._api_calls,
+                    "errors": self._api_errors,
+                },
+            }
 
     # -- Webhook handling (called by Fleet Manager → RPi) -------------------
+    _WEBHOOK_DISPATCH = {
+        "terminal.reader.action_succeeded": "_handle_action_succeeded",
+        "terminal.reader.action_failed": "_handle_action_failed",
+        "terminal.reader.action_updated": "_handle_action_updated",
+        "payment_intent.amount_capturable_updated": "_handle_amount_updated",
+        "payment_intent.canceled": "_handle_payment_cancelled",
+    }
+
     def handle_webhook(self, event_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         """
         Process an incoming Stripe webhook forwarded from Fleet Manager.
@@ -553,22 +730,15 @@ class StripeTerminal:
           - terminal.reader.action_updated: Reader action status update
           - payment_intent.amount_capturable_updated: Auth amount changed
         """
-        logger.info(f"[STRIPE] Webhook received: {event_type}")
-        logger.debug(f"[STRIPE] Webhook payload: {json.dumps(payload)[:500]}")
-
-        if event_type == "terminal.reader.action_succeeded":
-            return self._handle_action_succeeded(payload)
-        elif event_type == "terminal.reader.action_failed":
-            return self._handle_action_failed(payload)
-        elif event_type == "terminal.reader.action_updated":
-            return self._handle_action_updated(payload)
-        elif event_type == "payment_intent.amount_capturable_updated":
-            return self._handle_amount_updated(payload)
-        elif event_type == "payment_intent.canceled":
-            return self._handle_payment_cancelled(payload)
-        else:
+        logger.info("[STRIPE] Webhook received: %s", event_type)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[STRIPE] Webhook payload: %s", json.dumps(payload)[:500])
+
+        handler = self._WEBHOOK_DISPATCH.get(event_type)
+        if handler is None:
             logger.warning(f"[STRIPE] Unknown webhook event: {event_type}")
             return {"ok": True}
+        return getattr(self, handler)(payload)
 
     def _handle_action_succeeded(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Reader action succeeded (payment collected)."""
@@ -577,7 +747,8 @@ class StripeTerminal:
         action_type = action.get("type", "")
 
         if action_type == "process_payment_intent":
-            pi = action.get("process_payment_intent", {}).get("payment_intent", "")
+            process = action.get("process_payment_intent", {})
+            pi = process.get("payment_intent", "")
             logger.info(f"[STRIPE] Payment collected: pi={pi}")
 
             session = self._current_session
@@ -585,7 +756,7 @@ class StripeTerminal:
                 session.payment_intent_id = pi if isinstance(pi, str) else session.payment_intent_id
 
                 # Extract card details from the payment method
-                pm_details = action.get("process_payment_intent", {}).get("payment_method_details", {})
+                pm_details = process.get("payment_method_details", {})
                 card_present = pm_details.get("card_present", {})
                 interac = pm_details.get("interac_present", {})
 
@@ -597,8 +768,6 @@ class StripeTerminal:
                 elif card_present:
                     session.card_last4 = card_present.get("last4", "")
                     session.card_brand = card_present.get("brand", "")
-                    # Check if incremental auth is supported
-                    receipt = card_present.get("receipt", {})
                     session.incremental_supported = card_present.get(
                         "incremental_authorization_supported", False
                     )
@@ -749,7 +918,7 @@ class StripeTerminal:
                 self._api_calls += 1
                 pi = _stripe_get(f"payment_intents/{session.payment_intent_id}")
                 status = pi.get("status", "")
-                logger.info(f"[STRIPE] Poll: status={status} ({elapsed:.0f}s)")
+                logger.info("[STRIPE] Poll: status=%s (%.0fs)", status, elapsed)
 
                 if status == "requires_capture":
                     # Card payment (credit/debit) authorized — needs manual capture
@@ -816,20 +985,22 @@ class StripeTerminal:
             charges = pi.get("charges", {}).get("data", [])
             if charges:
                 pm_details = charges[0].get("payment_method_details", {})
-                interac = pm_details.get("interac_present", {})
-                card = pm_details.get("card_present", {})
-
-                if interac and interac.get("last4"):
+                # Single lookup per key: read last4 once and branch on it
+                last4 = pm_details.get("interac_present", {}).get("last4")
+                if last4:
                     session.is_interac = True
-                    session.card_last4 = interac.get("last4", "")
+                    session.card_last4 = last4
                     session.card_brand = "interac"
                     session.incremental_supported = False
-                elif card and card.get("last4"):
-                    session.card_last4 = card.get("last4", "")
-                    session.card_brand = card.get("brand", "")
-                    session.incremental_supported = card.get(
-                        "incremental_authorization_supported", False
-                    )
+                else:
+                    card = pm_details.get("card_present", {})
+                    last4 = card.get("last4")
+                    if last4:
+                        session.card_last4 = last4
+                        session.card_brand = card.get("brand", "")
+                        session.incremental_supported = card.get(
+                            "incremental_authorization_supported", False
+                        )
         except Exception as e:
             logger.warning(f"[STRIPE] Could not extract card details: {e}")
 
@@ -908,11 +1079,16 @@ class StripeTerminal:
     # -- Simulation ---------------------------------------------------------
     def _sim_authorize(self, session: VendSession):
         """Simulate payment authorization flow."""
-        logger.info(f"[STRIPE-SIM] Waiting {self._sim_approval_delay}s for card tap...")
+        logger.info("[STRIPE-SIM] Waiting %ss for card tap...", self._sim_approval_delay)
+        # Event.wait instead of time.sleep so cancel_session can abort the
+        # delay instead of leaving a zombie thread that approves a cancelled
+        # session after the fact.
         self._set_state(TerminalState.WAITING_PAYMENT)
-        time.sleep(self._sim_approval_delay / 2)
+        if self._cancel_event.wait(self._sim_approval_delay / 2):
+            return
         self._set_state(TerminalState.AUTHORIZING)
-        time.sleep(self._sim_approval_delay / 2)
+        if self._cancel_event.wait(self._sim_approval_delay / 2):
+            return
 
         if self._sim_auto_approve:
             session.payment_intent_id = f"pi_sim_{int(time.time())}"
@@ -924,7 +1100,7 @@ class StripeTerminal:
 
             self._set_state(TerminalState.PAYMENT_AUTHORIZED)
             self._emit("on_payment_authorized", session)
-            logger.info(f"[STRIPE-SIM] Payment AUTHORIZED - pi={session.payment_intent_id}")
+            logger.info("[STRIPE-SIM] Payment AUTHORIZED - pi=%s", session.payment_intent_id)
         else:
             session.payment_result = PaymentResult.DENIED.value
             session.error = "Simulated denial"
@@ -942,7 +1118,13 @@ _instance_lock = threading.Lock()
 
 def get_terminal() -> StripeTerminal:
     """Get or create the singleton StripeTerminal instance."""
+    # Double-checked: once created, return without touching the lock.
+    # Module-global reads/writes are atomic under the GIL, so the unlocked
+    # fast path can never observe a half-built reference.
     global _instance
+    inst = _instance
+    if inst is not None:
+        return inst
     with _instance_lock:
         if _instance is None:
             _instance = StripeTerminal()